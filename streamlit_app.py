@@ -9,35 +9,63 @@ Shri Lalita Bill Generator - ENHANCED VERSION v2
 """
 import streamlit as st
 import pandas as pd
+import numpy as np
 import sqlite3
 from contextlib import contextmanager
 from datetime import datetime, date
 from io import BytesIO
 import re
+import hmac
+import threading
+import zipfile
 
 # PDF Generation
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, LongTable, TableStyle
 from reportlab.lib.enums import TA_CENTER
 
 st.set_page_config(page_title="Shri Lalita", page_icon="🥛", layout="wide")
 
 DB = 'lalita.db'
+STATUSES = ["Due", "Partial", "Settled", "Advance"]
+MODES = ["", "Cash", "UPI", "Bank Transfer"]
+REPORT_ROWS = 40  # customers per status report table band
+FILENAME_CHARS = str.maketrans({c: '_' for c in ' /\\:*?"<>|'})
 
 # ==================== DATABASE ====================
-@contextmanager
-def db():
+@st.cache_resource
+def conn():
+    """Process-wide connection and the lock that serializes its use across sessions"""
     c = sqlite3.connect(DB, timeout=30, check_same_thread=False)
     c.row_factory = sqlite3.Row
     c.execute('PRAGMA journal_mode=WAL')
-    try:
-        yield c
-        c.commit()
-    finally:
-        c.close()
+    c.execute('PRAGMA synchronous=NORMAL')
+    c.execute('PRAGMA temp_store=MEMORY')
+    c.execute('PRAGMA cache_size=-20000')
+    c.execute('PRAGMA mmap_size=268435456')
+    return c, threading.RLock()
+
+@contextmanager
+def db():
+    c, lock = conn()
+    with lock:
+        try:
+            yield c
+            c.commit()
+        except BaseException:
+            c.rollback()
+            raise
+
+# Indexes on the upload tables, rebuilt in one pass after each bulk load
+UPLOAD_INDEXES = {
+    # Items clustered by receipt in entry order, covering the bill columns
+    'i6': 'CREATE INDEX IF NOT EXISTS i6 ON items(rid, id, item, amt)',
+    # Covers the per-customer receipt list and the items join, already in date order
+    'i4': 'CREATE INDEX IF NOT EXISTS i4 ON receipts(phone, date, rid, total)',
+}
 
 def init():
     with db() as c:
@@ -54,20 +82,29 @@ def init():
         c.execute('''CREATE TABLE IF NOT EXISTS payments (
             id INTEGER PRIMARY KEY, phone TEXT, amount REAL, mode TEXT, 
             payment_date TEXT, remarks TEXT, created_at TEXT)''')
-        c.execute('CREATE INDEX IF NOT EXISTS i1 ON receipts(phone)')
-        c.execute('CREATE INDEX IF NOT EXISTS i2 ON items(rid)')
-        c.execute('CREATE INDEX IF NOT EXISTS i3 ON payments(phone)')
+        for sql in UPLOAD_INDEXES.values():
+            c.execute(sql)
+        c.execute('CREATE INDEX IF NOT EXISTS i5 ON payments(phone, payment_date)')
+        # Superseded by the compound and covering indexes above
+        c.execute('DROP INDEX IF EXISTS i1')
+        c.execute('DROP INDEX IF EXISTS i3')
+        c.execute('DROP INDEX IF EXISTS i2')
 
 def norm(p):
-    if pd.isna(p): return None
-    s = str(int(float(p)))
-    if s.startswith('91') and len(s)==12: s = s[2:]
-    return s if len(s)>=10 else s
+    """Normalize a phone column to digit strings, dropping a 91 country code"""
+    n = pd.to_numeric(p, errors='coerce').astype(float)
+    # Numeric cells are truncated, as int(float(x)) did; formatted text such as
+    # '+91 98765-43210' keeps its digits; cells with no digits become NULL
+    s = np.trunc(n.where(np.isfinite(n))).astype('Int64').astype('string')
+    s = s.fillna(p.astype('string').str.replace(r'\D', '', regex=True).replace('', pd.NA))
+    s = s.where(~(s.str.len().eq(12) & s.str.startswith('91')), s.str.slice(2))
+    return s.astype(object).where(s.notna(), None)
 
 # ==================== PASSWORD ====================
 def pw():
     def ck():
-        if st.session_state["pw"] == st.secrets.get("password", "lalita2025"):
+        if hmac.compare_digest(st.session_state["pw"].encode(),
+                               st.secrets.get("password", "lalita2025").encode()):
             st.session_state["ok"] = True
             del st.session_state["pw"]
         else:
@@ -85,23 +122,45 @@ def pw():
     return True
 
 # ==================== DATA FUNCTIONS ====================
+RCOLS = ['ReceiptId', 'Date', 'CustomerName', 'CustomerNumber', 'Total', 'PaymentMode']
+ICOLS = ['ReceiptId', 'EntryType', 'EntryName', 'EntryAmount']
+
+@st.cache_data(show_spinner="📖 Reading Excel...", max_entries=4)
+def load_excel(data):
+    """Parse uploaded workbook bytes into credit receipts and their line items"""
+    x = pd.read_excel(BytesIO(data), sheet_name=['receipts', 'receiptsWithItems'], engine='calamine',
+                      usecols=lambda col: col in RCOLS or col in ICOLS)
+    dr = x['receipts'][RCOLS]
+    di = x['receiptsWithItems'][ICOLS]
+    dr = dr.assign(CustomerNumber=norm(dr['CustomerNumber']))
+    dr = dr[dr['PaymentMode'] == 'Credit']
+    di = di.loc[di['EntryType'].eq('Item') & di['ReceiptId'].isin(dr['ReceiptId'].unique())]
+    return dr, di
+
 def save(dr, di):
     p = st.progress(0)
     s = st.empty()
     try:
         with db() as c:
             s.text("Clearing...")
+            c.execute('BEGIN IMMEDIATE')
+            for name in UPLOAD_INDEXES:
+                c.execute(f'DROP INDEX IF EXISTS {name}')
             c.execute('DELETE FROM receipts')
             c.execute('DELETE FROM items')
             p.progress(20)
             s.text(f"Saving {len(dr)} receipts...")
             c.executemany('INSERT INTO receipts VALUES (?,?,?,?,?,?)',
-                         [(r.ReceiptId,str(r.Date),r.CustomerName,r.CustomerNumber,r.Total,r.PaymentMode) 
-                          for _,r in dr.iterrows()])
+                         dr[RCOLS].assign(Date=dr['Date'].map(str)).itertuples(index=False, name=None))
             p.progress(60)
             s.text(f"Saving {len(di)} items...")
-            c.executemany('INSERT INTO items VALUES (?,?,?,?)',
-                         [(None,i.ReceiptId,i.EntryName,i.EntryAmount) for _,i in di.iterrows()])
+            c.executemany('INSERT INTO items (rid, item, amt) VALUES (?,?,?)',
+                         di[['ReceiptId', 'EntryName', 'EntryAmount']].itertuples(index=False, name=None))
+            p.progress(90)
+            s.text("Indexing...")
+            for sql in UPLOAD_INDEXES.values():
+                c.execute(sql)
+            c.execute('PRAGMA optimize')
             p.progress(100)
         s.empty()
         p.empty()
@@ -110,80 +169,118 @@ def save(dr, di):
         st.error(str(e))
         return False
 
-@st.cache_data(ttl=300)
-def load():
-    try:
-        with db() as c:
-            r = pd.read_sql('SELECT * FROM receipts', c)
-            i = pd.read_sql('SELECT * FROM items', c)
-        return r if len(r)>0 else None, i if len(i)>0 else None
-    except:
-        return None, None
+@st.cache_data(ttl=300, show_spinner=False)
+def counts():
+    """Number of receipts and distinct customers loaded"""
+    with db() as c:
+        return tuple(c.execute('SELECT COUNT(*), COUNT(DISTINCT phone) FROM receipts').fetchone())
+
+# Customer name from their first receipt that has one, for a receipts row aliased r
+NAME_SQL = '''(SELECT n.name FROM receipts n WHERE n.phone = r.phone AND n.name IS NOT NULL
+    ORDER BY n.rowid LIMIT 1)'''
+
+# One row per customer: display name and the receipt total
+TOTALS_SQL = f'''SELECT phone, {NAME_SQL} AS name, SUM(total) AS total FROM receipts r
+    WHERE phone IS NOT NULL GROUP BY phone'''
+
+def totals(order):
+    """Per-customer name and receipt total, aggregated in SQLite"""
+    with db() as c:
+        return pd.read_sql(f'SELECT phone, name, total FROM ({TOTALS_SQL}) ORDER BY {order}', c)
+
+TRACKING_DEFAULTS = {'prev':0,'adv':0,'paid':0,'acf':0,'status':'Due','pmode':'','date':'',
+                     'addr':'','remarks':'','ccol':0,'cdep':0}
+TRACKING_COLS = {
+    'name':'Name','phone':'Phone','addr':'Address','total':'Amount Due',
+    'prev':'Previous Balance','advg':'Advance Given?','adv':'Advance Amount',
+    'status':'Payment Status','paid':'Amount Paid','rem':'Remaining Amount',
+    'pmode':'Payment Mode','date':'Received On','ccol':'Cash Collected',
+    'cdep':'Cash Deposited','remarks':'Remarks','acf':'Advance CF'}
 
+def cats(s, known):
+    """Categorical column with the known options first, keeping any other stored values"""
+    return pd.Categorical(s, categories=known + sorted(set(s.dropna()) - set(known)))
+
+@st.cache_data(ttl=300, show_spinner=False)
 def initpd():
-    r,i = load()
-    if r is None: return None
-    s = r.groupby('phone').agg({'name':'first','total':'sum'}).reset_index()
     with db() as c:
-        t = pd.read_sql('SELECT * FROM tracking', c)
-    m = s.merge(t, on='phone', how='left', suffixes=('','_t'))
-    for col in ['prev','adv','paid','acf']:
-        m[col] = m[col].fillna(0)
-    m['status'] = m['status'].fillna('Due')
-    m['pmode'] = m['pmode'].fillna('')
-    m['date'] = m['date'].fillna('')
-    m['addr'] = m['addr'].fillna('')
-    m['remarks'] = m['remarks'].fillna('')
-    m['ccol'] = m['ccol'].fillna(0).astype(bool)
-    m['cdep'] = m['cdep'].fillna(0).astype(bool)
+        m = pd.read_sql(f'''SELECT s.phone, s.name, s.total, t.addr, t.prev, t.adv, t.status,
+            t.paid, t.pmode, t.date, t.ccol, t.cdep, t.remarks, t.acf
+            FROM ({TOTALS_SQL}) s LEFT JOIN tracking t USING (phone) ORDER BY s.phone''', c)
+    if len(m)==0: return None
+    m = m.fillna(TRACKING_DEFAULTS)
+    # All-NULL joined columns come back as object, so pin the numeric dtypes
+    m = m.astype({'prev':float,'adv':float,'paid':float,'acf':float,'ccol':bool,'cdep':bool})
     m['rem'] = m['total'] + m['prev'] - m['adv'] - m['paid']
-    return pd.DataFrame({
-        'Name':m['name'],'Phone':m['phone'],'Address':m['addr'],'Amount Due':m['total'],
-        'Previous Balance':m['prev'],'Advance Given?':m['adv'].apply(lambda x:'Yes' if x>0 else 'No'),
-        'Advance Amount':m['adv'],'Payment Status':m['status'],'Amount Paid':m['paid'],
-        'Remaining Amount':m['rem'],'Payment Mode':m['pmode'],'Received On':m['date'],
-        'Cash Collected':m['ccol'],'Cash Deposited':m['cdep'],'Remarks':m['remarks'],'Advance CF':m['acf']})
+    m['advg'] = np.where(m['adv']>0,'Yes','No')
+    m['status'] = cats(m['status'], STATUSES)
+    m['pmode'] = cats(m['pmode'], MODES)
+    return m.rename(columns=TRACKING_COLS)[list(TRACKING_COLS.values())]
+
+def clear_cache():
+    """Drop cached query results after the database changes"""
+    counts.clear()
+    initpd.clear()
+    get_customer_list.clear()
+    get_customer_details.clear()
+    get_customer_items.clear()
+    generate_customer_bill_pdf.clear()
+    generate_all_bills_zip.clear()
+
+def changed(old, new):
+    """Rows of the edited frame that differ from the frame shown in the editor"""
+    same = (new == old) | (new.isna() & old.isna())
+    return new[~same.all(axis=1)]
+
+# Editor columns in tracking table order
+SAVET_COLS = ['Phone','Name','Address','Amount Due','Previous Balance','Advance Amount',
+              'Payment Status','Amount Paid','Remaining Amount','Payment Mode','Received On',
+              'Cash Collected','Cash Deposited','Remarks','Advance CF']
 
 def savet(df):
     try:
         with db() as c:
+            d = df[SAVET_COLS].astype({'Cash Collected':bool,'Cash Deposited':bool})
+            # Remaining is derived, so recompute it from the edited amounts
+            d['Remaining Amount'] = (d['Amount Due'] + d['Previous Balance'].fillna(0)
+                                     - d['Advance Amount'].fillna(0) - d['Amount Paid'].fillna(0))
             c.executemany('INSERT OR REPLACE INTO tracking VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)',
-                         [(r.Phone,r.Name,r.Address,r['Amount Due'],r['Previous Balance'],
-                           r['Advance Amount'],r['Payment Status'],r['Amount Paid'],r['Remaining Amount'],
-                           r['Payment Mode'],r['Received On'],
-                           1 if r['Cash Collected'] else 0,1 if r['Cash Deposited'] else 0,
-                           r.Remarks,r['Advance CF']) for _,r in df.iterrows()])
-        load.clear()
+                          zip(*(d[k].tolist() for k in SAVET_COLS)))
+        st.session_state.pd = None
+        clear_cache()
         return True
     except Exception as e:
         st.error(str(e))
         return False
 
 # ==================== NEW: CUSTOMER DETAILS FUNCTIONS ====================
+@st.cache_data(ttl=300, show_spinner=False)
 def get_customer_list():
-    """Get list of all customers with totals"""
-    r, _ = load()
-    if r is None:
-        return []
-    customers = r.groupby('phone').agg({
-        'name': 'first',
-        'total': 'sum'
-    }).reset_index()
-    customers = customers.sort_values('total', ascending=False)
+    """Get list of all customers with totals and their selector labels"""
+    customers = totals('total DESC, phone')
+    customers['label'] = [f"{n} ({p}) - ₹{t:,.2f}" for n, p, t in
+                          zip(customers['name'], customers['phone'], customers['total'])]
     return customers.to_dict('records')
 
+@st.cache_data(ttl=300, show_spinner=False)
 def get_customer_details(phone):
     """Get full details for a single customer"""
     with db() as c:
-        # Basic info
-        cust = c.execute('SELECT * FROM receipts WHERE phone=? LIMIT 1', (phone,)).fetchone()
-        if not cust:
-            return None
-        
         # All receipts
         receipts = c.execute('''
             SELECT rid, date, total FROM receipts WHERE phone=? ORDER BY date DESC
         ''', (phone,)).fetchall()
+        if not receipts:
+            return None
+        
+        # Name and totals in one statement, summed in SQLite
+        cust = c.execute(f'''
+            SELECT {NAME_SQL} AS name,
+                   (SELECT COALESCE(SUM(total), 0) FROM receipts WHERE phone=:p) AS purchases,
+                   (SELECT COALESCE(SUM(amount), 0) FROM payments WHERE phone=:p) AS paid
+            FROM (SELECT :p AS phone) r
+        ''', {'p': phone}).fetchone()
+        total_purchases, total_paid = cust['purchases'], cust['paid']
         
         # Tracking info
         tracking = c.execute('SELECT * FROM tracking WHERE phone=?', (phone,)).fetchone()
@@ -193,10 +290,6 @@ def get_customer_details(phone):
             SELECT * FROM payments WHERE phone=? ORDER BY payment_date DESC
         ''', (phone,)).fetchall()
         
-        # Calculate totals
-        total_purchases = sum(r['total'] for r in receipts)
-        total_paid = sum(p['amount'] for p in payments) if payments else 0
-        
         # Also get paid from tracking if no payment records
         if not payments and tracking:
             total_paid = tracking['paid'] or 0
@@ -212,6 +305,7 @@ def get_customer_details(phone):
             'balance': total_purchases - total_paid
         }
 
+@st.cache_data(ttl=300, show_spinner=False)
 def get_customer_items(phone):
     """Get all line items for a customer"""
     with db() as c:
@@ -233,40 +327,130 @@ def record_payment(phone, amount, mode, payment_date, remarks=""):
             VALUES (?, ?, ?, ?, ?, ?)
         ''', (phone, amount, mode, payment_date, remarks, datetime.now().isoformat()))
         
-        # Update tracking table
-        existing = c.execute('SELECT * FROM tracking WHERE phone=?', (phone,)).fetchone()
-        if existing:
-            new_paid = (existing['paid'] or 0) + amount
-            new_rem = (existing['due'] or 0) + (existing['prev'] or 0) - (existing['adv'] or 0) - new_paid
-            new_status = 'Settled' if new_rem <= 0 else ('Partial' if new_paid > 0 else 'Due')
-            
-            c.execute('''
-                UPDATE tracking SET 
-                    paid = ?,
-                    rem = ?,
-                    pmode = ?,
-                    date = ?,
-                    status = ?
-                WHERE phone = ?
-            ''', (new_paid, new_rem, mode, payment_date, new_status, phone))
+        # Create the customer's tracking row if it was never saved
+        c.execute(f'''
+            INSERT OR IGNORE INTO tracking (phone, name, due)
+            SELECT phone, {NAME_SQL}, SUM(total) FROM receipts r WHERE phone=? GROUP BY phone
+        ''', (phone,))
+        
+        # Update tracking in place; every SET expression sees the pre-update row
+        c.execute('''
+            UPDATE tracking SET 
+                paid = COALESCE(paid, 0) + :amt,
+                rem = COALESCE(due, 0) + COALESCE(prev, 0) - COALESCE(adv, 0) - COALESCE(paid, 0) - :amt,
+                pmode = :mode,
+                date = :date,
+                status = CASE
+                    WHEN COALESCE(due, 0) + COALESCE(prev, 0) - COALESCE(adv, 0) - COALESCE(paid, 0) - :amt <= 0
+                        THEN 'Settled'
+                    WHEN COALESCE(paid, 0) + :amt > 0 THEN 'Partial'
+                    ELSE 'Due' END
+            WHERE phone = :phone
+        ''', {'amt': amount, 'mode': mode, 'date': payment_date, 'phone': phone})
     
     # Clear cache
-    load.clear()
+    clear_cache()
     if 'pd' in st.session_state:
         st.session_state.pd = None
 
 # ==================== PDF GENERATION ====================
+ITEM_RE = re.compile(r'^(.+?)\s*\((\d+\.?\d*)\s*X\s*(\d+\.?\d*)\)')
+
 def parse_item(entry_name):
     """Parse item entry like 'Buffalo Milk (2 X 75)'"""
     if pd.isna(entry_name):
         return None, 0, 0
-    match = re.match(r'(.+?)\s*\((\d+\.?\d*)\s*X\s*(\d+\.?\d*)\)', str(entry_name))
+    match = ITEM_RE.match(str(entry_name))
     if match:
         return match.group(1).strip(), float(match.group(2)), float(match.group(3))
     return str(entry_name), 1, 0
 
+def parse_items(entries):
+    """Vectorized parse_item over a Series: product, qty and rate columns"""
+    parts = entries.astype('string').str.extract(ITEM_RE)
+    return pd.DataFrame({
+        'product': parts[0].str.strip().fillna(entries.astype('string')),
+        'qty': parts[1].astype(float).fillna(1.0),
+        'rate': parts[2].astype(float).fillna(0.0),
+    })
+
+@st.cache_resource
+def pdf_styles():
+    """Paragraph and table styles shared by every generated PDF"""
+    navy = colors.HexColor('#1e3a5f')
+    grid = colors.HexColor('#dddddd')
+    s = getSampleStyleSheet()
+    s.add(ParagraphStyle(name='BillTitle', parent=s['Heading1'],
+                         fontSize=18, alignment=TA_CENTER, textColor=navy))
+    s.add(ParagraphStyle(name='ReportTitle', parent=s['Heading1'],
+                         fontSize=16, alignment=TA_CENTER, textColor=navy))
+    s.add(ParagraphStyle(name='Section', parent=s['Heading2'],
+                         fontSize=12, textColor=navy, spaceBefore=10, spaceAfter=5))
+    s.add(ParagraphStyle(name='Centered', fontSize=10, alignment=TA_CENTER))
+    s.add(ParagraphStyle(name='Footer', fontSize=8, alignment=TA_CENTER, textColor=colors.gray))
+    t = {
+        'items': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), navy),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('ALIGN', (2, 1), (-1, -1), 'CENTER'),
+            ('GRID', (0, 0), (-1, -1), 0.5, grid),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f5f5f5')]),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ]),
+        'summary': TableStyle([
+            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+            ('FONTSIZE', (0, 0), (-1, -1), 11),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('LINEABOVE', (0, -1), (-1, -1), 1, navy),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ]),
+        'payments': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4caf50')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 0.5, grid),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ]),
+        'stats': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), navy),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOX', (0, 0), (-1, -1), 1, navy),
+            ('GRID', (0, 0), (-1, -1), 0.5, grid),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ]),
+        'customers': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), navy),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ALIGN', (1, 1), (1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 8),
+            ('FONTSIZE', (0, 1), (-1, -1), 7),
+            ('GRID', (0, 0), (-1, -1), 0.5, grid),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ]),
+    }
+    return s, t
+
+@st.cache_data(ttl=300, show_spinner=False, max_entries=128)
 def generate_customer_bill_pdf(phone):
-    """Generate PDF bill for a customer"""
+    """Generate PDF bill for a customer, cached until the data next changes"""
     details = get_customer_details(phone)
     if not details:
         return None
@@ -278,18 +462,12 @@ def generate_customer_bill_pdf(phone):
                            rightMargin=15*mm, leftMargin=15*mm,
                            topMargin=15*mm, bottomMargin=15*mm)
     
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='Title2', parent=styles['Heading1'],
-                             fontSize=18, alignment=TA_CENTER,
-                             textColor=colors.HexColor('#1e3a5f')))
-    styles.add(ParagraphStyle(name='Section', parent=styles['Heading2'],
-                             fontSize=12, textColor=colors.HexColor('#1e3a5f'),
-                             spaceBefore=10, spaceAfter=5))
+    styles, tstyles = pdf_styles()
     
     story = []
     
     # Title
-    story.append(Paragraph("Customer Receipt", styles['Title2']))
+    story.append(Paragraph("Customer Receipt", styles['BillTitle']))
     story.append(Paragraph("Shri Lalita - Pure and Natural Milk", styles['Normal']))
     story.append(Spacer(1, 5*mm))
     
@@ -305,34 +483,26 @@ def generate_customer_bill_pdf(phone):
     # Items Table
     story.append(Paragraph("Purchase Details", styles['Section']))
     
-    table_data = [['Date', 'Product', 'Qty', 'Rate', 'Amount']]
-    for item in items:
-        product, qty, rate = parse_item(item['item'])
-        if product:
-            amt = item['amt'] if item['amt'] else qty * rate
-            table_data.append([
-                str(item['date'])[:16] if item['date'] else '',
-                product[:30],
-                f"{qty:.0f}" if qty == int(qty) else f"{qty:.1f}",
-                f"Rs.{rate:.2f}",
-                f"Rs.{amt:.2f}"
-            ])
+    header = ('Date', 'Product', 'Qty', 'Rate', 'Amount')
+    rows = pd.DataFrame(items, columns=['date', 'rid', 'item', 'amt'])
+    parsed = parse_items(rows['item'])
+    keep = parsed['product'].fillna('').ne('')
+    rows, parsed = rows[keep], parsed[keep]
+    qty, rate = parsed['qty'], parsed['rate']
+    amt = rows['amt'].where(rows['amt'].fillna(0).ne(0), qty * rate)
+    table_data = list(zip(
+        rows['date'].fillna('').astype(str).str.slice(0, 16),
+        parsed['product'].str.slice(0, 30),
+        np.where(qty.eq(qty.round()), qty.map('{:.0f}'.format), qty.map('{:.1f}'.format)),
+        rate.map('Rs.{:.2f}'.format),
+        amt.astype(float).map('Rs.{:.2f}'.format),
+    ))
     
-    if len(table_data) > 1:
-        col_widths = [35*mm, 60*mm, 20*mm, 30*mm, 30*mm]
-        items_table = Table(table_data, colWidths=col_widths, repeatRows=1)
-        items_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a5f')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('ALIGN', (2, 1), (-1, -1), 'CENTER'),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dddddd')),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f5f5f5')]),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-        ]))
+    # Bounded bands, as in the status report, keep layout linear for long histories
+    col_widths = [35*mm, 60*mm, 20*mm, 30*mm, 30*mm]
+    for i in range(0, len(table_data), REPORT_ROWS):
+        items_table = LongTable([header, *table_data[i:i+REPORT_ROWS]], colWidths=col_widths, repeatRows=1)
+        items_table.setStyle(tstyles['items'])
         story.append(items_table)
     
     story.append(Spacer(1, 8*mm))
@@ -347,17 +517,9 @@ def generate_customer_bill_pdf(phone):
     ]
     
     summary_table = Table(summary_data, colWidths=[100*mm, 60*mm])
-    summary_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
-        ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('TEXTCOLOR', (1, -1), (1, -1), 
-         colors.HexColor('#d32f2f') if details['balance'] > 0 else colors.HexColor('#2e7d32')),
-        ('LINEABOVE', (0, -1), (-1, -1), 1, colors.HexColor('#1e3a5f')),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-    ]))
+    summary_table.setStyle(tstyles['summary'])
+    summary_table.setStyle([('TEXTCOLOR', (1, -1), (1, -1),
+        colors.HexColor('#d32f2f') if details['balance'] > 0 else colors.HexColor('#2e7d32'))])
     story.append(summary_table)
     
     # Payment History
@@ -375,47 +537,51 @@ def generate_customer_bill_pdf(phone):
             ])
         
         pay_table = Table(pay_data, colWidths=[35*mm, 35*mm, 35*mm, 55*mm])
-        pay_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4caf50')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dddddd')),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-        ]))
+        pay_table.setStyle(tstyles['payments'])
         story.append(pay_table)
     
     # Footer
     story.append(Spacer(1, 10*mm))
     story.append(Paragraph(
         f"Generated: {datetime.now().strftime('%d-%m-%Y %H:%M')}",
-        ParagraphStyle(name='Footer', fontSize=8, alignment=TA_CENTER, textColor=colors.gray)
+        styles['Footer']
     ))
     
     doc.build(story)
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
+
+def bill_filename(name, phone):
+    """Filesystem-safe PDF name for a customer's bill, even without a stored name"""
+    name = str(name) if pd.notna(name) else 'customer'
+    return f"{name.translate(FILENAME_CHARS)}_{phone}.pdf"
 
+@st.cache_data(ttl=300, show_spinner="📦 Building bills...")
+def generate_all_bills_zip():
+    """Zip every customer's bill PDF into a single archive"""
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as z:
+        for c in get_customer_list():
+            pdf = generate_customer_bill_pdf(c['phone'])
+            if pdf:
+                z.writestr(bill_filename(c['name'], c['phone']), pdf)
+    return buffer.getvalue()
+
+@st.cache_data(ttl=300, show_spinner=False, max_entries=8)
 def generate_status_report_pdf(df):
-    """Generate customer status report PDF"""
+    """Generate customer status report PDF, cached per distinct frame"""
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4,
                            rightMargin=10*mm, leftMargin=10*mm,
                            topMargin=15*mm, bottomMargin=15*mm)
     
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name='Title2', parent=styles['Heading1'],
-                             fontSize=16, alignment=TA_CENTER,
-                             textColor=colors.HexColor('#1e3a5f')))
+    styles, tstyles = pdf_styles()
     
     story = []
     
     # Title
-    story.append(Paragraph("Customer Status Report", styles['Title2']))
+    story.append(Paragraph("Customer Status Report", styles['ReportTitle']))
     story.append(Paragraph(f"Generated: {datetime.now().strftime('%d-%m-%Y %H:%M')}", 
-                          ParagraphStyle(name='Sub', fontSize=10, alignment=TA_CENTER)))
+                          styles['Centered']))
     story.append(Spacer(1, 5*mm))
     
     # Summary Stats
@@ -430,69 +596,63 @@ def generate_status_report_pdf(df):
     ]
     
     stats_table = Table(stats_data, colWidths=[45*mm, 45*mm, 45*mm, 45*mm])
-    stats_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a5f')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#1e3a5f')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dddddd')),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ('TOPPADDING', (0, 0), (-1, -1), 8),
-    ]))
+    stats_table.setStyle(tstyles['stats'])
     story.append(stats_table)
     story.append(Spacer(1, 5*mm))
     
     # Status counts
     sc = df['Payment Status'].value_counts()
     count_text = f"Settled: {sc.get('Settled', 0)} | Partial: {sc.get('Partial', 0)} | Due: {sc.get('Due', 0)} | Total: {len(df)}"
-    story.append(Paragraph(count_text, ParagraphStyle(name='Counts', fontSize=10, alignment=TA_CENTER)))
+    story.append(Paragraph(count_text, styles['Centered']))
     story.append(Spacer(1, 5*mm))
     
     # Customer List
-    table_data = [['#', 'Customer', 'Phone', 'Amount', 'Paid', 'Due', 'Status']]
-    
-    for i, (_, row) in enumerate(df.iterrows(), 1):
-        status = row['Payment Status']
-        table_data.append([
-            str(i),
-            str(row['Name'])[:20],
-            str(row['Phone']),
-            f"Rs.{row['Amount Due']:,.0f}",
-            f"Rs.{row['Amount Paid']:,.0f}",
-            f"Rs.{row['Remaining Amount']:,.0f}",
-            status.upper()[:3]
-        ])
+    header = ('#', 'Customer', 'Phone', 'Amount', 'Paid', 'Due', 'Status')
+    
+    cols = [
+        [str(i) for i in range(1, len(df) + 1)],
+        df['Name'].astype(str).str.slice(0, 20),
+        df['Phone'].astype(str),
+        df['Amount Due'].map('Rs.{:,.0f}'.format),
+        df['Amount Paid'].map('Rs.{:,.0f}'.format),
+        df['Remaining Amount'].map('Rs.{:,.0f}'.format),
+        df['Payment Status'].astype(str).str.upper().str.slice(0, 3),
+    ]
+    rows = list(zip(*cols))
     
+    # Bands of bounded size keep ReportLab's split/layout cost linear in rows
     col_widths = [10*mm, 40*mm, 28*mm, 28*mm, 28*mm, 28*mm, 15*mm]
-    cust_table = Table(table_data, colWidths=col_widths, repeatRows=1)
-    cust_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a5f')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('ALIGN', (1, 1), (1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 8),
-        ('FONTSIZE', (0, 1), (-1, -1), 7),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dddddd')),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9f9f9')]),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ('TOPPADDING', (0, 0), (-1, -1), 3),
-    ]))
-    story.append(cust_table)
+    for i in range(0, len(rows), REPORT_ROWS):
+        cust_table = LongTable([header, *rows[i:i+REPORT_ROWS]], colWidths=col_widths, repeatRows=1)
+        cust_table.setStyle(tstyles['customers'])
+        story.append(cust_table)
     
     # Footer
     story.append(Spacer(1, 10*mm))
-    story.append(Paragraph("Shri Lalita - Credit Management System",
-                          ParagraphStyle(name='Footer', fontSize=8, alignment=TA_CENTER, textColor=colors.gray)))
+    story.append(Paragraph("Shri Lalita - Credit Management System", styles['Footer']))
     
     doc.build(story)
-    buffer.seek(0)
-    return buffer
+    return buffer.getvalue()
 
 # ==================== UI VIEWS ====================
+@st.cache_data(show_spinner=False)
+def dash_stats(df):
+    """Compute all dashboard figures in one pass per column"""
+    t, rec, rem = df[['Amount Due', 'Amount Paid', 'Remaining Amount']].sum()
+    # Sum per stored mode first, then classify only the distinct modes
+    paid = df['Amount Paid'].groupby(df['Payment Mode'], observed=True).sum()
+    mode = paid.index.astype(str).str.lower().str.extract('(upi|bhim|cash)', expand=False)
+    by_mode = paid.groupby(mode.str.replace('bhim', 'upi').to_numpy()).sum()
+    top = df.nlargest(10, 'Remaining Amount')[['Name', 'Phone', 'Remaining Amount']]
+    top = top.assign(**{'Remaining Amount': top['Remaining Amount'].map('₹{:,.2f}'.format)})
+    return {
+        't': t, 'rec': rec, 'rem': rem,
+        'recov': (rec/t*100) if t>0 else 0,
+        'sc': df['Payment Status'].value_counts(),
+        'ua': by_mode.get('upi', 0), 'ca': by_mode.get('cash', 0),
+        'top': top
+    }
+
 def dash(df):
     """Dashboard view"""
     if df is None or len(df) == 0:
@@ -501,11 +661,8 @@ def dash(df):
     
     st.header("📊 Dashboard")
     
-    t = df['Amount Due'].sum()
-    rec = df['Amount Paid'].sum()
-    rem = df['Remaining Amount'].sum()
-    recov = (rec/t*100) if t>0 else 0
-    sc = df['Payment Status'].value_counts()
+    d = dash_stats(df)
+    t, rec, rem, recov, sc = d['t'], d['rec'], d['rem'], d['recov'], d['sc']
     
     c1, c2, c3 = st.columns(3)
     with c1:
@@ -518,12 +675,8 @@ def dash(df):
         st.metric("❌ Due", sc.get('Due', 0))
         st.metric("📊 Total Customers", len(df))
     with c3:
-        upi = df[df['Payment Mode'].str.contains('UPI|BHIM', case=False, na=False)]
-        cash = df[df['Payment Mode'].str.contains('Cash', case=False, na=False)]
-        ua = upi['Amount Paid'].sum()
-        ca = cash['Amount Paid'].sum()
-        st.metric("📱 UPI Amount", f"₹{ua:,.2f}")
-        st.metric("💵 Cash Amount", f"₹{ca:,.2f}")
+        st.metric("📱 UPI Amount", f"₹{d['ua']:,.2f}")
+        st.metric("💵 Cash Amount", f"₹{d['ca']:,.2f}")
         st.metric("📈 Recovery %", f"{recov:.2f}%")
     
     st.markdown("---")
@@ -534,9 +687,7 @@ def dash(df):
         st.bar_chart(sc)
     with col2:
         st.subheader("🔝 Top 10 Outstanding")
-        top = df.nlargest(10, 'Remaining Amount')[['Name', 'Phone', 'Remaining Amount']]
-        top['Remaining Amount'] = top['Remaining Amount'].apply(lambda x: f"₹{x:,.2f}")
-        st.dataframe(top, hide_index=True, use_container_width=True)
+        st.dataframe(d['top'], hide_index=True, use_container_width=True)
 
 def customer_detail_view():
     """NEW: Individual customer detail view"""
@@ -550,9 +701,8 @@ def customer_detail_view():
     # Customer selector
     col1, col2 = st.columns([3, 1])
     with col1:
-        customer_options = [f"{c['name']} ({c['phone']}) - ₹{c['total']:,.2f}" for c in customers]
         selected_idx = st.selectbox("🔍 Select Customer", options=range(len(customers)), 
-                                   format_func=lambda x: customer_options[x])
+                                   format_func=lambda x: customers[x]['label'])
     
     if selected_idx is not None:
         phone = customers[selected_idx]['phone']
@@ -566,10 +716,19 @@ def customer_detail_view():
                     st.download_button(
                         "📄 Download Bill",
                         data=pdf_buffer,
-                        file_name=f"{details['name'].replace(' ', '_')}_{phone}.pdf",
+                        file_name=bill_filename(details['name'], phone),
                         mime="application/pdf",
                         use_container_width=True
                     )
+                # All bills as one ZIP, built only on the run the button is clicked
+                if st.button("📦 All Bills (ZIP)", use_container_width=True):
+                    st.download_button(
+                        "⬇️ Download ZIP",
+                        data=generate_all_bills_zip(),
+                        file_name=f"Bills_{datetime.now().strftime('%Y%m%d')}.zip",
+                        mime="application/zip",
+                        use_container_width=True
+                    )
             
             # Customer Info Card
             st.markdown("---")
@@ -634,7 +793,7 @@ def customer_detail_view():
                         amount = st.number_input("Amount (₹)", min_value=0.0, 
                                                 value=float(max(0, details['balance'])),
                                                 step=100.0, format="%.2f")
-                        mode = st.selectbox("Payment Mode", ["Cash", "UPI", "Bank Transfer"])
+                        mode = st.selectbox("Payment Mode", MODES[1:])
                     with col2:
                         payment_date = st.date_input("Payment Date", value=date.today())
                         remarks = st.text_input("Remarks (optional)")
@@ -650,6 +809,7 @@ def customer_detail_view():
                         else:
                             st.error("Please enter a valid amount")
 
+@st.fragment
 def tracking_view(df):
     """Payment tracking grid view"""
     st.header("📋 Payment Tracking")
@@ -661,7 +821,7 @@ def tracking_view(df):
     with col2:
         phone_filter = st.text_input("🔍 Search Phone", "")
     with col3:
-        status_filter = st.selectbox("Status", ["All", "Due", "Partial", "Settled", "Advance"])
+        status_filter = st.selectbox("Status", ["All"] + STATUSES)
     with col4:
         # Download Status Report PDF
         pdf_buffer = generate_status_report_pdf(df)
@@ -674,13 +834,14 @@ def tracking_view(df):
         )
     
     # Filter data
-    fdf = df.copy()
+    mask = np.ones(len(df), dtype=bool)
     if name_filter:
-        fdf = fdf[fdf['Name'].str.contains(name_filter, case=False, na=False)]
+        mask &= df['Name'].str.contains(name_filter, case=False, na=False, regex=False).to_numpy()
     if phone_filter:
-        fdf = fdf[fdf['Phone'].str.contains(phone_filter, na=False)]
+        mask &= df['Phone'].str.contains(phone_filter, na=False, regex=False).to_numpy()
     if status_filter != "All":
-        fdf = fdf[fdf['Payment Status'] == status_filter]
+        mask &= (df['Payment Status'] == status_filter).to_numpy()
+    fdf = df if mask.all() else df[mask]
     
     st.info(f"📊 Showing {len(fdf)} of {len(df)} customers")
     
@@ -693,26 +854,48 @@ def tracking_view(df):
         column_config={
             "Amount Due": st.column_config.NumberColumn(format="₹%.2f"),
             "Amount Paid": st.column_config.NumberColumn(format="₹%.2f"),
-            "Remaining Amount": st.column_config.NumberColumn(format="₹%.2f"),
+            "Remaining Amount": st.column_config.NumberColumn(format="₹%.2f", disabled=True),
             "Previous Balance": st.column_config.NumberColumn(format="₹%.2f"),
             "Advance Amount": st.column_config.NumberColumn(format="₹%.2f"),
             "Advance CF": st.column_config.NumberColumn(format="₹%.2f"),
             "Payment Status": st.column_config.SelectboxColumn(
-                options=["Due", "Partial", "Settled", "Advance"]
+                options=STATUSES
             ),
             "Payment Mode": st.column_config.SelectboxColumn(
-                options=["", "Cash", "UPI", "Bank Transfer"]
+                options=MODES
             ),
         }
     )
     
     if st.button("💾 Save Changes", type="primary"):
-        if savet(ed):
+        if savet(changed(fdf, ed)):
             st.success("✅ Changes saved!")
             st.balloons()
             st.rerun()
 
 # ==================== MAIN APP ====================
+FEATURES_MD = """
+### ✨ Features
+- 📊 Dashboard
+- 👤 **Customer Details** ⭐
+- 📦 **Line Items View** ⭐
+- 📄 **PDF Bills** ⭐
+- 💳 **Payment Recording** ⭐
+- 📋 Status Report PDF
+"""
+
+WELCOME_MD = """
+### 🚀 New Features in v2:
+
+| Feature | Description |
+|---------|-------------|
+| 👤 **Customer Details** | View individual customer's full history |
+| 📦 **Line Items** | See what products each customer bought |
+| 📄 **PDF Bills** | Download professional PDF bill per customer |
+| 💳 **Payment Recording** | Record payments with history tracking |
+| 📋 **Status Report** | Download full customer status as PDF |
+"""
+
 def main():
     if not pw():
         return
@@ -727,46 +910,39 @@ def main():
     # Sidebar
     with st.sidebar:
         st.header("📁 Data Management")
-        r, i = load()
+        n, nc = counts()
         
-        if r is not None:
+        if n:
             st.success(f"✅ Data Loaded")
-            st.info(f"📊 {len(r)} transactions\n👥 {r['phone'].nunique()} customers")
+            st.info(f"📊 {n} transactions\n👥 {nc} customers")
         
         f = st.file_uploader("📤 Upload Excel", type=['xlsx', 'xls'], key='excel_upload')
         
-        if f and ('last_upload' not in st.session_state or st.session_state.get('last_upload') != f.name):
+        if f and st.session_state.get('last_upload') != f.file_id:
             try:
                 with st.spinner("Processing..."):
-                    s = st.empty()
-                    s.info("📖 Reading Excel...")
-                    dr = pd.read_excel(f, sheet_name='receipts',
-                                      usecols=['ReceiptId', 'Date', 'CustomerName', 'CustomerNumber', 'Total', 'PaymentMode'])
-                    di = pd.read_excel(f, sheet_name='receiptsWithItems',
-                                      usecols=['ReceiptId', 'EntryType', 'EntryName', 'EntryAmount'])
-                    s.info("🔧 Normalizing phones...")
-                    dr['CustomerNumber'] = dr['CustomerNumber'].apply(norm)
-                    s.info("🔍 Filtering credit transactions...")
-                    dr = dr[dr['PaymentMode'] == 'Credit']
-                    di = di[di['ReceiptId'].isin(dr['ReceiptId']) & (di['EntryType'] == 'Item')]
-                    s.empty()
+                    dr, di = load_excel(f.getvalue())
+                    nophone = dr['CustomerNumber'].isna().sum()
+                    if nophone:
+                        st.warning(f"⚠️ {nophone} credit receipts have no usable phone number "
+                                   "and are left out of customer totals")
                     
                     if save(dr, di):
-                        st.session_state.last_upload = f.name
+                        st.session_state.last_upload = f.file_id
                         st.session_state.pd = None
-                        load.clear()
+                        clear_cache()
                         st.success(f"✅ Processed {len(dr)} transactions!")
                         st.balloons()
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
         
-        if r is not None:
+        if n:
             st.markdown("---")
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("🔄 Refresh", use_container_width=True):
                     st.session_state.pd = None
-                    load.clear()
+                    clear_cache()
                     st.rerun()
             with col2:
                 if st.button("🗑️ Clear", use_container_width=True):
@@ -777,35 +953,17 @@ def main():
                         c.execute('DELETE FROM payments')
                     st.session_state.pd = None
                     st.session_state.last_upload = None
-                    load.clear()
+                    clear_cache()
                     st.success("Cleared!")
                     st.rerun()
         
         st.markdown("---")
-        st.markdown("""
-        ### ✨ Features
-        - 📊 Dashboard
-        - 👤 **Customer Details** ⭐
-        - 📦 **Line Items View** ⭐
-        - 📄 **PDF Bills** ⭐
-        - 💳 **Payment Recording** ⭐
-        - 📋 Status Report PDF
-        """)
+        st.markdown(FEATURES_MD)
     
     # Main content
-    if load()[0] is None:
+    if not counts()[0]:
         st.info("👆 Upload Excel file to start")
-        st.markdown("""
-        ### 🚀 New Features in v2:
-        
-        | Feature | Description |
-        |---------|-------------|
-        | 👤 **Customer Details** | View individual customer's full history |
-        | 📦 **Line Items** | See what products each customer bought |
-        | 📄 **PDF Bills** | Download professional PDF bill per customer |
-        | 💳 **Payment Recording** | Record payments with history tracking |
-        | 📋 **Status Report** | Download full customer status as PDF |
-        """)
+        st.markdown(WELCOME_MD)
         return
     
     # Initialize data